@@ -1,4 +1,9 @@
+import array
+import io
 import json
+import queue
+import shutil
+import sys
 import threading
 import time
 import tkinter as tk
@@ -6,165 +11,540 @@ from tkinter import filedialog, messagebox
 from pynput import mouse, keyboard
 from pynput.mouse import Controller as MouseController
 from pynput.keyboard import Controller as KeyboardController, Key
-from contextlib import contextmanager
+
+try:
+    import ctypes
+    _winmm = ctypes.windll.winmm if sys.platform == "win32" else None
+except Exception:
+    _winmm = None
+
+try:
+    import orjson
+except ImportError:  # fallback to stdlib json
+    orjson = None
+
+
+try:
+    import zstandard as zstd
+except ImportError:  # files are written uncompressed
+    zstd = None
+
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def _open_write(filepath):
+    f = open(filepath, "wb")
+    if zstd is None:
+        return f
+    return zstd.ZstdCompressor(level=3).stream_writer(f)
+
+
+def _open_read(filepath):
+    # compressed and plain files are told apart by the zstd frame magic
+    f = open(filepath, "rb")
+    if f.peek(4)[:4] != _ZSTD_MAGIC:
+        return f
+    if zstd is None:
+        f.close()
+        raise RuntimeError("Файл сжат zstd: установите пакет zstandard")
+    return io.BufferedReader(zstd.ZstdDecompressor().stream_reader(f))
+
+
+def _dumps(obj):
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# ---------------- Event columns ----------------
+# events are stored column-wise (one typed array per field) instead of a dict per event
+TYPE_MOVE = 0
+TYPE_CLICK = 1
+TYPE_SCROLL = 2
+TYPE_KEY_PRESS = 3
+TYPE_KEY_RELEASE = 4
+
+_TYPE_NAMES = ("mouse_move", "mouse_click", "mouse_scroll", "key_press", "key_release")
+_TYPE_CODES = {name: code for code, name in enumerate(_TYPE_NAMES)}
+
+# playback: the last part before a deadline is busy-waited instead of slept
+_SPIN_NS = 1_000_000
+
+_BUTTONS = list(mouse.Button)
+_BUTTON_IDS = {b: i for i, b in enumerate(_BUTTONS)}
+_KEY_MAP = {f"Key.{name}": member for name, member in Key.__members__.items()}
+
+
+def _resolve_key(k):
+    # file -> memory: "Key.space" -> Key.space, "'a'" -> 'a', 'a' stays 'a'
+    if not isinstance(k, str):
+        return k
+    key_obj = _KEY_MAP.get(k)
+    if key_obj is not None:
+        return key_obj
+    # strip quotes if recorded as "'a'"
+    if len(k) >= 2 and k[0] == "'" and k[-1] == "'":
+        return k[1:-1]
+    return k
+
+
+def _key_to_str(k):
+    # memory -> file: Key members are stored as "Key.xxx"
+    return str(k) if isinstance(k, Key) else k
+
 
 # ---------------- RecorderPlayer ----------------
 class RecorderPlayer:
-    def __init__(self):
+    # attributes replaced by _clear_events(); restored if a load fails
+    _EVENT_STATE = ("_ts", "_type", "_x", "_y", "_a", "_b", "_key", "_streamed", "_compiled")
+
+    def __init__(self, decimate=False, min_dt=0.008, min_dist=2):
         self.recording = False
         self.playing = False
-        self.start_time = None
-        self.events = []  # список dict событий
-        self.mouse_listener = None
-        self.kb_listener = None
+        self.loading = False
+        self._t0_ns = None
+        self._clear_events()
+        # streaming recording: events go straight to a file through a writer thread
+        self.record_path = None
+        self._record_queue = None
+        self._writer_thread = None
+        self._writer_error = None
+        # move decimation: drop moves too close (in time and distance) to the last kept one
+        self.decimate = decimate
+        self.min_dt_ns = int(min_dt * 1e9)
+        self.min_dist = min_dist
+        self._last_move = None
+        self._pending_move = None
+        # mouse and keyboard listeners run on different threads: one lock keeps
+        # every recorded row (all columns + pending move) consistent
+        self._record_lock = threading.Lock()
         self.play_thread = None
         self.stop_play_event = threading.Event()
         self.mouse_ctrl = MouseController()
         self.kb_ctrl = KeyboardController()
+        # callbacks invoked on state changes (may run on listener/playback threads)
+        self._listeners = []
 
-        # suppression for distinguishing synthetic events
-        self._suppress_lock = threading.Lock()
-        self._suppress_count = 0
+        # distinguishing synthetic events from user input: True only while playback
+        # waits and any user input should stop it; read by the global listeners
+        # with a single attribute load
+        self.stop_on_input = False
 
-    @contextmanager
-    def _suppress_events(self):
-        with self._suppress_lock:
-            self._suppress_count += 1
-        try:
-            yield
-        finally:
-            with self._suppress_lock:
-                self._suppress_count -= 1
+    def add_listener(self, fn):
+        self._listeners.append(fn)
 
-    def is_suppressed(self):
-        with self._suppress_lock:
-            return self._suppress_count > 0
+    def _notify(self):
+        for fn in self._listeners:
+            try:
+                fn()
+            except Exception:
+                pass
+
+    # ---------------- Event storage ----------------
+    def _clear_events(self):
+        # columns: time, type, x, y, a/b (click: button id / pressed; scroll: dx / dy), key
+        self._ts = array.array("q")  # ns since recording start
+        self._type = array.array("B")
+        self._x = array.array("i")
+        self._y = array.array("i")
+        self._a = array.array("i")
+        self._b = array.array("i")
+        self._key = []
+        self._streamed = 0
+        self._compiled = []  # (time, ((callable, args), ...)) ready for playback
+
+    def _compile(self):
+        # resolve every event to callables once, so playback only does fn(*args);
+        # calls sharing a timestamp are grouped so the scheduler waits once per group
+        mctrl, kctrl = self.mouse_ctrl, self.kb_ctrl
+        set_pos = type(mctrl).position.fset
+        compiled = []
+        last_t = None
+        # cursor moves to the position it already has are dropped: each one is a syscall
+        last_pos = None
+        for t, typ, x, y, a, b, key in self._rows():
+            if t != last_t:
+                calls = []
+                compiled.append((t, calls))
+                last_t = t
+            append = calls.append
+            if typ <= TYPE_SCROLL:
+                pos = (x, y)
+                if pos != last_pos:
+                    append((set_pos, (mctrl, pos)))
+                    last_pos = pos
+                if typ == TYPE_CLICK:
+                    append((mctrl.press if b else mctrl.release, (_BUTTONS[a],)))
+                elif typ == TYPE_SCROLL:
+                    append((mctrl.scroll, (a, b)))
+            elif key:
+                append((kctrl.press if typ == TYPE_KEY_PRESS else kctrl.release, (key,)))
+        self._compiled = [(t, tuple(calls)) for t, calls in compiled if calls]
+
+    def _append(self, t, typ, x=0, y=0, a=0, b=0, key=None):
+        if self._record_queue is not None:
+            if self._writer_error is not None:
+                # the writer has died: nothing takes rows off the queue any more
+                return False
+            self._record_queue.put_nowait((t, typ, int(x), int(y), int(a), int(b), key))
+            self._streamed += 1
+            # True every 64 events: the caller notifies (outside _record_lock)
+            return not self._streamed & 63
+        self._ts.append(t)
+        self._type.append(typ)
+        self._x.append(int(x))
+        self._y.append(int(y))
+        self._a.append(int(a))
+        self._b.append(int(b))
+        self._key.append(key)
+        return not len(self._ts) & 63
+
+    def _append_dict(self, ev):
+        # convert one dict event (file format) into columns
+        typ = _TYPE_CODES.get(ev.get("type"))
+        if typ is None:
+            return False
+        t = int(ev.get("time", 0) * 1e9)
+        x, y = ev.get("x"), ev.get("y")
+        if x is None or y is None:
+            x = y = 0
+        if typ == TYPE_CLICK:
+            btn_str = ev.get("button", "")
+            name = btn_str.split(".")[-1] if btn_str else "left"
+            btn_obj = getattr(mouse.Button, name, mouse.Button.left)
+            return self._append(t, typ, x, y, _BUTTON_IDS[btn_obj], ev.get("pressed", True))
+        elif typ == TYPE_SCROLL:
+            return self._append(t, typ, x, y, ev.get("dx", 0), ev.get("dy", 0))
+        elif typ == TYPE_MOVE:
+            return self._append(t, typ, x, y)
+        else:
+            return self._append(t, typ, key=_resolve_key(ev.get("key")))
+
+    @property
+    def event_count(self):
+        return len(self._ts) + self._streamed
+
+    def _rows(self):
+        # (time_ns, type, x, y, a, b, key) per event — same order as queue and file rows
+        return zip(self._ts, self._type, self._x, self._y, self._a, self._b, self._key)
 
     # ---------------- Recording ----------------
     def _time(self):
-        return time.time() - self.start_time if self.start_time else 0
-
-    def start_recording(self):
+        # monotonic int ns: not affected by wall-clock adjustments
+        return time.monotonic_ns() - self._t0_ns if self._t0_ns else 0
+
+    def _record_move(self, t, x, y):
+        if self.decimate:
+            last = self._last_move
+            if last is not None:
+                lt, lx, ly = last
+                if t - lt < self.min_dt_ns and abs(x - lx) + abs(y - ly) < self.min_dist:
+                    # keep it aside: it is written if it turns out to be the last move
+                    self._pending_move = (t, x, y)
+                    return False
+            self._last_move = (t, x, y)
+            self._pending_move = None
+        return self._append(t, TYPE_MOVE, x, y)
+
+    def _flush_move(self):
+        pending = self._pending_move
+        if pending is not None:
+            self._pending_move = None
+            self._last_move = pending
+            return self._append(pending[0], TYPE_MOVE, pending[1], pending[2])
+        return False
+
+    def start_recording(self, path=None):
         if self.playing:
             raise RuntimeError("Нельзя записывать во время воспроизведения")
-        self.events = []
-        self.start_time = time.time()
+        if self.loading:
+            raise RuntimeError("Нельзя записывать во время загрузки")
+        # open first: if the file cannot be created the current events are kept
+        f = _open_write(path) if path else None
+        self._clear_events()
+        self.record_path = None
+        self._last_move = None
+        self._pending_move = None
+        self._writer_error = None
+        if f is not None:
+            self.record_path = path
+            self._record_queue = queue.SimpleQueue()
+            self._writer_thread = threading.Thread(
+                target=self._writer, args=(f, self._record_queue), daemon=True
+            )
+            self._writer_thread.start()
+        self._t0_ns = time.monotonic_ns()
         self.recording = True
-
-        def on_move(x, y):
-            if self.recording:
-                self.events.append({"type": "mouse_move", "time": self._time(), "x": x, "y": y})
-
-        def on_click(x, y, button, pressed):
-            if self.recording:
-                self.events.append({
-                    "type": "mouse_click", "time": self._time(),
-                    "x": x, "y": y, "button": str(button), "pressed": bool(pressed)
-                })
-
-        def on_scroll(x, y, dx, dy):
-            if self.recording:
-                self.events.append({
-                    "type": "mouse_scroll", "time": self._time(),
-                    "x": x, "y": y, "dx": dx, "dy": dy
-                })
-
-        def on_press(key):
-            if self.recording:
-                # char if available, else string like "Key.space"
-                k = getattr(key, "char", str(key))
-                self.events.append({"type": "key_press", "time": self._time(), "key": k})
-
-        def on_release(key):
-            if self.recording:
-                k = getattr(key, "char", str(key))
-                self.events.append({"type": "key_release", "time": self._time(), "key": k})
-
-        self.mouse_listener = mouse.Listener(on_move=on_move, on_click=on_click, on_scroll=on_scroll)
-        self.kb_listener = keyboard.Listener(on_press=on_press, on_release=on_release)
-        self.mouse_listener.start()
-        self.kb_listener.start()
+        self._notify()
+
+    # called from the App's global listeners (mouse and keyboard threads) while recording;
+    # listeners are notified only after _record_lock is released: they may call into Tk,
+    # and the main thread takes the lock in stop_recording()
+    def record_move(self, x, y):
+        with self._record_lock:
+            due = self.recording and self._record_move(self._time(), x, y)
+        if due:
+            self._notify()
+
+    def record_click(self, x, y, button, pressed):
+        self._record_event(TYPE_CLICK, x, y, _BUTTON_IDS.get(button, 0), pressed)
+
+    def record_scroll(self, x, y, dx, dy):
+        self._record_event(TYPE_SCROLL, x, y, dx, dy)
+
+    def record_key_press(self, key):
+        # Key member as is, else its char
+        k = key if isinstance(key, Key) else getattr(key, "char", None)
+        self._record_event(TYPE_KEY_PRESS, key=k)
+
+    def record_key_release(self, key):
+        k = key if isinstance(key, Key) else getattr(key, "char", None)
+        self._record_event(TYPE_KEY_RELEASE, key=k)
+
+    def _record_event(self, typ, x=0, y=0, a=0, b=0, key=None):
+        with self._record_lock:
+            if not self.recording:
+                return
+            due = self._flush_move()
+            due = self._append(self._time(), typ, x, y, a, b, key) or due
+        if due:
+            self._notify()
 
     def stop_recording(self):
-        if not self.recording:
-            return
-        self.recording = False
-        time.sleep(0.05)
-        if self.mouse_listener:
-            try: self.mouse_listener.stop()
-            except: pass
-            self.mouse_listener = None
-        if self.kb_listener:
-            try: self.kb_listener.stop()
-            except: pass
-            self.kb_listener = None
-        self.start_time = None
+        # under the lock: no listener callback is half-way through a row after this
+        with self._record_lock:
+            if not self.recording:
+                return
+            self.recording = False
+            self._t0_ns = None
+            self._flush_move()
+        if self._record_queue is not None:
+            # sentinel -> writer flushes and closes the file
+            self._record_queue.put(None)
+            self._writer_thread.join()
+            self._record_queue = None
+            self._writer_thread = None
+        error = self._writer_error
+        if error is not None:
+            # the file on disk is incomplete: do not treat it as the recording
+            self._writer_error = None
+            self._clear_events()
+            self.record_path = None
+        self._compile()
+        self._notify()
+        if error is not None:
+            raise error
+
+    def _writer(self, f, q):
+        # a failed write is kept for stop_recording() to raise
+        try:
+            with f:
+                self._write_header(f)
+                while True:
+                    row = q.get()
+                    if row is None:
+                        break
+                    self._write_row(f, row)
+        except Exception as e:
+            self._writer_error = e
+
+    @staticmethod
+    def _write_header(f):
+        f.write(_dumps({"format": "stream", "time": "ns", "buttons": [str(b) for b in _BUTTONS]}))
+        f.write(b"\n")
+
+    @staticmethod
+    def _write_row(f, row):
+        if row[6] is not None:
+            row = row[:6] + (_key_to_str(row[6]),)
+        f.write(_dumps(row))
+        f.write(b"\n")
 
     # ---------------- Save/Load ----------------
     def save(self, filepath):
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(self.events, f, ensure_ascii=False, indent=2)
+        if self.record_path:
+            # streamed recording is already on disk
+            if filepath != self.record_path:
+                shutil.copyfile(self.record_path, filepath)
+            return
+        # same line-per-event format as streaming recording, so load can stream it back
+        with _open_write(filepath) as f:
+            self._write_header(f)
+            for row in self._rows():
+                self._write_row(f, row)
 
     def load(self, filepath):
-        with open(filepath, "r", encoding="utf-8") as f:
-            self.events = json.load(f)
+        # may run on a worker thread: progress is reported through _notify()
+        self.loading = True
+        self._notify()
+        # keep the current events until the new file has been read completely
+        saved = {name: getattr(self, name) for name in self._EVENT_STATE}
+        saved_path = self.record_path
+        try:
+            self._load(filepath)
+            self._compile()
+        except Exception:
+            for name, value in saved.items():
+                setattr(self, name, value)
+            self.record_path = saved_path
+            raise
+        finally:
+            self.loading = False
+            self._notify()
+
+    def _load(self, filepath):
+        with _open_read(filepath) as f:
+            # stream files start with a one-line header, followed by one row per line;
+            # they are parsed line by line straight into the columns
+            first = f.readline()
+            try:
+                data = _loads(first)
+            except ValueError:
+                data = None
+            if isinstance(data, dict) and data.get("format") == "stream":
+                self._clear_events()
+                self.record_path = None
+                self._load_rows(self._iter_rows(f), data.get("buttons", []))
+                return
+            rest = f.read()
+            if data is None or rest.strip():
+                data = _loads(first + rest)
+        # otherwise only the original format is accepted: a list of dict events
+        if not isinstance(data, list):
+            raise ValueError("Неизвестный формат файла")
+        self._clear_events()
+        self.record_path = None
+        for ev in data:
+            if self._append_dict(ev):
+                self._notify()
+
+    @staticmethod
+    def _iter_rows(f):
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield _loads(line)
+            except ValueError:
+                if line.endswith(b"\n"):
+                    raise
+                # last line cut off (streamed recording interrupted by a crash)
+                return
+
+    def _load_rows(self, rows, buttons):
+        btn_map = self._button_map(buttons)
+        left = _BUTTON_IDS[mouse.Button.left]
+        for t, typ, x, y, a, b, key in rows:
+            if typ == TYPE_CLICK:
+                a = btn_map[a] if a < len(btn_map) else left
+            if self._append(t, typ, x, y, a, b, _resolve_key(key)):
+                self._notify()
+
+    @staticmethod
+    def _button_map(buttons):
+        # map button ids of the file onto local mouse.Button ids
+        btn_map = []
+        for btn_str in buttons:
+            btn_obj = getattr(mouse.Button, btn_str.split(".")[-1], mouse.Button.left)
+            btn_map.append(_BUTTON_IDS[btn_obj])
+        return btn_map
 
     # ---------------- Playback ----------------
     def play(self, repeat_count=1, interval=0):
         if self.recording:
             raise RuntimeError("Нельзя воспроизводить во время записи")
-        if not self.events:
+        if self.loading:
+            raise RuntimeError("Нельзя воспроизводить во время загрузки")
+        if not self.event_count:
             raise RuntimeError("Нет записанных событий")
+        if not self._compiled:
+            # e.g. only keys without a char: nothing to replay
+            raise RuntimeError("Нет событий для воспроизведения")
         if self.playing:
             return
 
         self.stop_play_event.clear()
         self.playing = True
+        self._notify()
 
         def target():
+            if _winmm is not None:
+                # raise the Windows timer resolution to 1 ms while playing
+                _winmm.timeBeginPeriod(1)
             try:
+                # hot-path lookups resolved once, not per event
+                compiled = self._compiled
+                is_set = self.stop_play_event.is_set
+                wait_until = self._wait_until
+                mono = time.monotonic_ns
                 cycles_done = 0
                 infinite = (repeat_count <= 0)
                 while infinite or cycles_done < repeat_count:
-                    base_time = None
-                    for ev in self.events:
-                        if self.stop_play_event.is_set():
+                    if is_set():
+                        return
+                    base_ns = None
+                    # user input only stops playback while waiting for the next deadline,
+                    # not while events of the cycle are being sent
+                    self.stop_on_input = False
+                    for t, calls in compiled:
+                        if is_set():
                             return
                         # compute target time relative to start of cycle
-                        if base_time is None:
-                            base_time = time.time() - ev.get("time", 0)
-                        target_time = base_time + ev.get("time", 0)
-                        # wait responsively
-                        while True:
-                            if self.stop_play_event.is_set():
+                        if base_ns is None:
+                            base_ns = mono() - t
+                        deadline_ns = base_ns + t
+                        if deadline_ns > mono():
+                            self.stop_on_input = True
+                            stopped = wait_until(deadline_ns)
+                            self.stop_on_input = False
+                            if stopped:
                                 return
-                            now = time.time()
-                            remaining = target_time - now
-                            if remaining <= 0:
-                                break
-                            time.sleep(min(0.01, remaining))
-                        # perform event (suppress listener while performing)
-                        try:
-                            self._perform_event(ev)
-                        except Exception:
-                            # ignore problems per-event to not kill whole playback
-                            pass
+                        for fn, args in calls:
+                            try:
+                                fn(*args)
+                            except Exception:
+                                # ignore problems per-event to not kill whole playback
+                                pass
                     cycles_done += 1
-                    # wait interval between cycles in small chunks
+                    # wait interval between cycles, wakes up early on stop
                     if interval > 0:
-                        endt = time.time() + interval
-                        while time.time() < endt:
-                            if self.stop_play_event.is_set():
-                                return
-                            time.sleep(0.05)
+                        self.stop_on_input = True
+                        if self.stop_play_event.wait(interval):
+                            return
             finally:
-                self.playing = False
-
+                if _winmm is not None:
+                    _winmm.timeEndPeriod(1)
+                # a stop through stop_play() resets the state and notifies from the thread
+                # joining this one: only a natural end is reported from here, and never
+                # over a newer playback
+                if not self.stop_play_event.is_set() and self.play_thread is threading.current_thread():
+                    self.stop_on_input = False
+                    self.playing = False
+                    self._notify()
+
+        # set before start(): a short playback may end before start() returns
         self.play_thread = threading.Thread(target=target, daemon=True)
         self.play_thread.start()
 
+    def _wait_until(self, deadline_ns):
+        # coarse wait on the stop event (wakes up early on stop), then spin the last ms
+        mono = time.monotonic_ns
+        remaining = deadline_ns - mono()
+        if remaining > _SPIN_NS and self.stop_play_event.wait((remaining - _SPIN_NS) / 1e9):
+            return True
+        while mono() < deadline_ns:
+            pass
+        return self.stop_play_event.is_set()
+
     def stop_play(self):
         # signal stop
+        self.stop_on_input = False
         self.stop_play_event.set()
         # join only if caller is not playback thread
         if self.play_thread and threading.current_thread() != self.play_thread:
@@ -175,93 +555,7 @@ class RecorderPlayer:
         self.playing = False
         # clear event so next play can run normally
         self.stop_play_event.clear()
-
-    def _perform_event(self, ev):
-        t = ev.get("type")
-        if t == "mouse_move":
-            with self._suppress_events():
-                x, y = ev.get("x"), ev.get("y")
-                if x is not None and y is not None:
-                    self.mouse_ctrl.position = (x, y)
-        elif t == "mouse_click":
-            x, y = ev.get("x"), ev.get("y")
-            btn_str = ev.get("button", "")
-            pressed = ev.get("pressed", True)
-            name = btn_str.split(".")[-1] if btn_str else "left"
-            btn_obj = getattr(mouse.Button, name, mouse.Button.left)
-            with self._suppress_events():
-                if x is not None and y is not None:
-                    self.mouse_ctrl.position = (x, y)
-                if pressed:
-                    self.mouse_ctrl.press(btn_obj)
-                else:
-                    self.mouse_ctrl.release(btn_obj)
-        elif t == "mouse_scroll":
-            x, y = ev.get("x"), ev.get("y")
-            dx, dy = ev.get("dx", 0), ev.get("dy", 0)
-            with self._suppress_events():
-                if x is not None and y is not None:
-                    self.mouse_ctrl.position = (x, y)
-                self.mouse_ctrl.scroll(dx, dy)
-        elif t == "key_press":
-            k = ev.get("key")
-            self._press_key_from_string(k)
-        elif t == "key_release":
-            k = ev.get("key")
-            self._release_key_from_string(k)
-
-    def _press_key_from_string(self, k):
-        if not k:
-            return
-        # k may be a single char like 'a' or "Key.space" or "'a'"
-        if isinstance(k, str) and k.startswith("Key."):
-            try:
-                key_obj = getattr(Key, k.split(".", 1)[1])
-                with self._suppress_events():
-                    self.kb_ctrl.press(key_obj)
-                return
-            except Exception:
-                pass
-        # strip quotes if recorded as "'a'"
-        if isinstance(k, str) and len(k) >= 2 and k[0] == "'" and k[-1] == "'":
-            ch = k[1:-1]
-            with self._suppress_events():
-                try:
-                    self.kb_ctrl.press(ch)
-                except Exception:
-                    pass
-            return
-        # normal char
-        try:
-            with self._suppress_events():
-                self.kb_ctrl.press(k)
-        except Exception:
-            pass
-
-    def _release_key_from_string(self, k):
-        if not k:
-            return
-        if isinstance(k, str) and k.startswith("Key."):
-            try:
-                key_obj = getattr(Key, k.split(".", 1)[1])
-                with self._suppress_events():
-                    self.kb_ctrl.release(key_obj)
-                return
-            except Exception:
-                pass
-        if isinstance(k, str) and len(k) >= 2 and k[0] == "'" and k[-1] == "'":
-            ch = k[1:-1]
-            with self._suppress_events():
-                try:
-                    self.kb_ctrl.release(ch)
-                except Exception:
-                    pass
-            return
-        try:
-            with self._suppress_events():
-                self.kb_ctrl.release(k)
-        except Exception:
-            pass
+        self._notify()
 
 
 # ---------------- GUI / App ----------------
@@ -289,6 +583,8 @@ class App:
         self.interval_var = tk.StringVar(value="1.0")
         self.repeat_var = tk.StringVar(value="1")
         self.infinite_var = tk.IntVar(value=0)
+        self.stream_var = tk.IntVar(value=0)
+        self.decimate_var = tk.IntVar(value=0)
         self.events_count_var = tk.StringVar(value="Событий: 0")
 
         # build UI with grid
@@ -307,7 +603,9 @@ class App:
         self.global_k_listener.start()
         self.global_m_listener.start()
 
-        # ui updater
+        # ui is refreshed on RecorderPlayer state changes
+        self._ui_refresh_pending = False
+        self.rp.add_listener(self._on_rp_change)
         self._ui_updater()
 
     def _build_ui(self):
@@ -339,13 +637,15 @@ class App:
         # row 3-4 settings
         tk.Label(self.root, text="Интервал (сек):").grid(row=3, column=0, sticky="e", padx=8, pady=6)
         tk.Entry(self.root, textvariable=self.interval_var, width=12).grid(row=3, column=1, sticky="w")
+        tk.Checkbutton(self.root, text="Прореживать движения", variable=self.decimate_var).grid(row=3, column=2, sticky="w")
 
         tk.Label(self.root, text="Повтор (0 = бесконечно):").grid(row=4, column=0, sticky="e", padx=8, pady=6)
         tk.Entry(self.root, textvariable=self.repeat_var, width=12).grid(row=4, column=1, sticky="w")
         tk.Checkbutton(self.root, text="Бесконечно", variable=self.infinite_var).grid(row=4, column=2, sticky="w")
 
         # events count & hint
-        tk.Label(self.root, textvariable=self.events_count_var).grid(row=5, column=0, columnspan=3, sticky="w", padx=8, pady=8)
+        tk.Label(self.root, textvariable=self.events_count_var).grid(row=5, column=0, columnspan=2, sticky="w", padx=8, pady=8)
+        tk.Checkbutton(self.root, text="Писать сразу в файл", variable=self.stream_var).grid(row=5, column=2, sticky="w")
         tk.Label(self.root, text="F8 — запуск / стоп воспроизведения; любое вмешательство пользователя при воспроизведении прерывает его.").grid(row=6, column=0, columnspan=3, sticky="w", padx=8, pady=6)
 
         # apply initial theme
@@ -386,8 +686,10 @@ class App:
         self.dark = not self.dark
         self.apply_theme()
 
-    # ----------------- global listeners (detect user interference & F8) -----------------
+    # ----------------- global listeners (recording, user interference & F8) -----------------
     def _on_global_key_press(self, key):
+        if self.rp.recording:
+            self.rp.record_key_press(key)
         # F8 toggles playback (start/stop)
         try:
             if key == Key.f8:
@@ -401,65 +703,96 @@ class App:
         except Exception:
             pass
 
-        # any other key while playing and NOT suppressed -> treat as user intervention -> stop
-        if self.rp.playing and (not self.rp.is_suppressed()):
+        # any other key while playback waits -> treat as user intervention -> stop
+        if self.rp.stop_on_input:
             self.root.after(0, self.stop_play)
 
     def _on_global_key_release(self, key):
-        # we don't need special handling on release, but keep to avoid listener closure
-        return
+        if self.rp.recording:
+            self.rp.record_key_release(key)
 
     def _on_global_mouse_move(self, x, y):
-        if self.rp.playing and (not self.rp.is_suppressed()):
+        if self.rp.recording:
+            self.rp.record_move(x, y)
+        if self.rp.stop_on_input:
             self.root.after(0, self.stop_play)
 
     def _on_global_mouse_click(self, x, y, button, pressed):
-        if self.rp.playing and (not self.rp.is_suppressed()):
+        if self.rp.recording:
+            self.rp.record_click(x, y, button, pressed)
+        if self.rp.stop_on_input:
             self.root.after(0, self.stop_play)
 
     def _on_global_mouse_scroll(self, x, y, dx, dy):
-        if self.rp.playing and (not self.rp.is_suppressed()):
+        if self.rp.recording:
+            self.rp.record_scroll(x, y, dx, dy)
+        if self.rp.stop_on_input:
             self.root.after(0, self.stop_play)
 
     # ----------------- UI actions -----------------
+    def _on_rp_change(self):
+        # called from listener/playback threads: schedule a single refresh on main thread
+        if not self._ui_refresh_pending:
+            self._ui_refresh_pending = True
+            self.root.after(0, self._ui_updater)
+
     def _ui_updater(self):
+        self._ui_refresh_pending = False
         # events count + buttons states
-        self.events_count_var.set(f"Событий: {len(self.rp.events)}")
-        self.btn_play.config(state="normal" if self.rp.events and not self.rp.playing else "disabled")
+        self.events_count_var.set(f"Событий: {self.rp.event_count}")
+        idle = not (self.rp.playing or self.rp.loading)
+        self.btn_play.config(state="normal" if self.rp.event_count and idle else "disabled")
         self.btn_stop_play.config(state="normal" if self.rp.playing else "disabled")
         self.btn_stop_rec.config(state="normal" if self.rp.recording else "disabled")
-        self.btn_save.config(state="normal" if self.rp.events and not self.rp.recording else "disabled")
+        self.btn_save.config(state="normal" if self.rp.event_count and not self.rp.recording and not self.rp.loading else "disabled")
+        self.btn_load.config(state="disabled" if self.rp.loading or self.rp.recording else "normal")
         # status
         if self.rp.recording:
             self.status_var.set("Запись...")
         elif self.rp.playing:
             self.status_var.set("Воспроизведение...")
+        elif self.rp.loading:
+            self.status_var.set("Загрузка...")
         else:
             self.status_var.set("Ожидание")
-        self.root.after(150, self._ui_updater)
 
     def start_recording(self):
+        path = None
+        if self.stream_var.get():
+            path = filedialog.asksaveasfilename(defaultextension=".rec", filetypes=[("REC файлы", "*.rec")])
+            if not path:
+                return
+        self.rp.decimate = bool(self.decimate_var.get())
         try:
-            self.rp.start_recording()
+            self.rp.start_recording(path)
             # ui updates handled by _ui_updater
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось начать запись:\n{e}")
 
     def stop_recording(self):
-        self.rp.stop_recording()
-        self.events_count_var.set(f"Событий: {len(self.rp.events)}")
-        messagebox.showinfo("Готово", f"Запись завершена. Событий: {len(self.rp.events)}")
+        try:
+            self.rp.stop_recording()
+        except Exception as e:
+            messagebox.showerror("Ошибка", f"Запись в файл прервана:\n{e}")
+            return
+        if self.rp.record_path:
+            # load the streamed file back so it can be played right away
+            self._load_in_background(self.rp.record_path, lambda: messagebox.showinfo(
+                "Готово", f"Запись завершена. Событий: {self.rp.event_count}"))
+            return
+        self.events_count_var.set(f"Событий: {self.rp.event_count}")
+        messagebox.showinfo("Готово", f"Запись завершена. Событий: {self.rp.event_count}")
 
     def save_file(self):
-        if not self.rp.events:
+        if not self.rp.event_count:
             messagebox.showwarning("Нет событий", "Нет записанных событий для сохранения.")
             return
-        path = filedialog.asksaveasfilename(defaultextension=".rec", filetypes=[("REC файлы", "*.rec"), ("JSON", "*.json")])
+        path = filedialog.asksaveasfilename(defaultextension=".rec", filetypes=[("REC файлы", "*.rec")])
         if not path:
             return
         try:
             self.rp.save(path)
-            messagebox.showinfo("Сохранено", f"Сохранено {len(self.rp.events)} событий в:\n{path}")
+            messagebox.showinfo("Сохранено", f"Сохранено {self.rp.event_count} событий в:\n{path}")
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось сохранить:\n{e}")
 
@@ -467,18 +800,30 @@ class App:
         path = filedialog.askopenfilename(filetypes=[("REC файлы", "*.rec"), ("JSON", "*.json")])
         if not path:
             return
-        try:
-            self.rp.load(path)
-            self.events_count_var.set(f"Событий: {len(self.rp.events)}")
-            messagebox.showinfo("Загружено", f"Загружено {len(self.rp.events)} событий из:\n{path}")
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось загрузить:\n{e}")
+        self._load_in_background(path, lambda: messagebox.showinfo(
+            "Загружено", f"Загружено {self.rp.event_count} событий из:\n{path}"))
+
+    def _load_in_background(self, path, on_done):
+        # parse on a worker thread so Tk stays responsive; count updates via listener.
+        # loading is set here already so Play/F8 stay blocked until the worker starts
+        self.rp.loading = True
+        self._on_rp_change()
+
+        def worker():
+            try:
+                self.rp.load(path)
+            except Exception as e:
+                self.root.after(0, lambda err=e: messagebox.showerror("Ошибка", f"Не удалось загрузить:\n{err}"))
+                return
+            self.root.after(0, on_done)
+
+        threading.Thread(target=worker, daemon=True).start()
 
     def play(self):
         if self.rp.recording:
             messagebox.showwarning("Нельзя", "Сначала остановите запись.")
             return
-        if not self.rp.events:
+        if not self.rp.event_count:
             messagebox.showwarning("Нет данных", "Нет событий для воспроизведения.")
             return
         try: